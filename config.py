@@ -1,5 +1,8 @@
-from pydantic import SecretStr, Field
-from pydantic_settings import BaseSettings, SettingsConfigDict
+import os
+from functools import cached_property, lru_cache
+from typing import Annotated
+from pydantic import SecretStr, Field, field_validator
+from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 
 class Setting(BaseSettings):
     # Load .env file 
@@ -14,18 +17,63 @@ class Setting(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
+    # --- PASSWORD HASHING (Argon2id) ---
+    # 12 MiB / t=3 / p=1 is one of the OWASP-listed equivalent Argon2id profiles.
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 12288 # KiB
+    argon2_parallelism: int = 1
+
+    # --- CORS ---
+    # Comma-separated in env, e.g. ALLOWED_ORIGINS=https://lokerin.id,http://localhost:3000
+    allowed_origins: Annotated[list[str], NoDecode] = ["*"]
+
     # --- DATABASE ---
     db_user: str = Field(alias="POSTGRES_USER")
-    db_password: str = Field(alias="POSTGRES_PASSWORD")
+    db_password: SecretStr = Field(alias="POSTGRES_PASSWORD")
     db_name: str = Field(alias="POSTGRES_DB")
     db_host: str = "localhost"
     db_port: int = 5435
+    sql_echo: bool = False # Log every SQL statement (development only)
+    run_migrations_on_startup: bool = False # Run init_db() (extensions + create_all) on every boot
+
+    # --- CONNECTION POOL ---
+    db_pool_size: int = 20
+    db_max_overflow: int = 30
+    db_pool_timeout: int = 10       # Seconds to wait for a free connection
+    db_pool_recycle: int = 1800     # Seconds before a connection is replaced
+    db_pool_pre_ping: bool = True
+
+    # --- VECTOR SEARCH (pgvector HNSW) ---
+    hnsw_ef_search: int = 40 # Candidates scanned per /match query (higher = better recall, slower)
+
+    # --- EMBEDDING MODEL ---
+    embedding_device: str = "auto" # "auto" (CUDA if available), "cpu", "cuda", "cuda:1", ...
+    embedding_backend: str = "torch" # "torch" or "onnx" (ONNX Runtime, needs `optimum[onnxruntime]`)
+    embedding_onnx_file: str = "onnx/model.onnx" # e.g. "onnx/model_qint8_avx2.onnx" for int8 weights
+    preload_embedding_model: bool = True # Load the model at startup instead of on the first request
+    inference_concurrency: int = Field(default_factory=lambda: os.cpu_count() or 1) # Parallel model/PDF jobs
+    embedding_batch_size: int = 32 # Max texts coalesced into one model call
+    embedding_batch_wait_ms: int = 10 # How long a batch waits for more texts before it runs
+
+    @field_validator("allowed_origins", mode="before")
+    @classmethod
+    def split_origins(cls, value):
+        if isinstance(value, str):
+            return [origin.strip() for origin in value.split(",") if origin.strip()]
+        return value
 
-    @property
+    @cached_property
     def database_url(self) -> str:
+        # Built once per Setting instance; the fields never change after load.
         return (
-            f"postgresql+asyncpg://{self.db_user}:{self.db_password}"
+            f"postgresql+asyncpg://{self.db_user}:{self.db_password.get_secret_value()}"
             f"@{self.db_host}:{self.db_port}/{self.db_name}"
         )
 
-settings = Setting()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Setting:
+    """
+    Builds the Settings object once (reads env + .env) and reuses it afterwards.
+    Tests can override the environment and call `get_settings.cache_clear()`.
+    """
+    return Setting()
\ No newline at end of file
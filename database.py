@@ -1,13 +1,21 @@
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import text
-from config import settings
+from sqlalchemy import inspect, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import get_settings
+
+settings = get_settings()
 
 # 1. Create the Async Engine
 engine = create_async_engine(
     settings.database_url, 
-    echo=True,          # Log SQL queries to console
-    pool_pre_ping=True, # Checks connection health before using it
+    echo=settings.sql_echo, # Log SQL queries to console (dev only)
+    poolclass=AsyncAdaptedQueuePool, # Reuse asyncpg connections across requests (never NullPool)
+    pool_pre_ping=settings.db_pool_pre_ping, # Checks connection health before using it
+    pool_size=settings.db_pool_size,            # Persistent connections kept open
+    max_overflow=settings.db_max_overflow,      # Extra connections allowed under burst load
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,      # Avoids reusing connections the server may have dropped
 )
 
 # 2. Create Session Factory
@@ -33,17 +41,94 @@ async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
 
+async def warm_up_pool():
+    """
+    Opens the first pooled connection at startup (runs `SELECT 1`).
+    The first request doesn't pay the TCP/auth handshake, and a bad DB config fails at boot.
+    """
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+def _convert_vector_columns(sync_conn):
+    """
+    Migrates embedding columns still stored as fp32 `vector` to the `halfvec` the models declare.
+    Their HNSW indexes use `vector_*_ops` and can't be converted, so they are dropped first
+    (same names: `_create_missing_indexes` then rebuilds them with `halfvec_*_ops`).
+    """
+    from pgvector.sqlalchemy import HALFVEC
+
+    preparer = sync_conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if not isinstance(column.type, HALFVEC):
+                continue
+            udt_name = sync_conn.execute(
+                text(
+                    "SELECT udt_name FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"
+                ),
+                {"table": table.name, "column": column.name},
+            ).scalar()
+            if udt_name != "vector":
+                continue
+
+            for index in table.indexes:
+                if column.name in {indexed.name for indexed in index.columns}:
+                    sync_conn.execute(text(f"DROP INDEX IF EXISTS {preparer.quote(index.name)}"))
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ALTER COLUMN {preparer.format_column(column)} TYPE {column_type} "
+                f"USING {preparer.format_column(column)}::{column_type}"
+            ))
+
+def _add_missing_columns(sync_conn):
+    """ Adds nullable columns declared on the models that existing tables don't have yet. """
+    inspector = inspect(sync_conn)
+    preparer = sync_conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                sync_conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN IF NOT EXISTS {preparer.format_column(column)} "
+                    f"{column.type.compile(dialect=sync_conn.dialect)}"
+                ))
+
+def _create_missing_indexes(sync_conn):
+    """ Creates any index declared on the models that is not in the database yet. """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
 # 5. Database Initialization (Run on startup)
 async def init_db():
     """ 
     **Initialize Database**
     
     1. Connects to the DB.
-    2. Enables the `vector` extension (Critical for AI features).
-    3. Creates all tables defined in `models.py`.
+    2. Enables the `vector` extension (Critical for AI features) and `pg_trgm` (text search).
+    3. Creates all tables (and any missing nullable columns and indexes) defined in `models.py`.
+    4. Converts embedding columns created as `vector` (fp32) to `halfvec`, rebuilding their indexes.
+    
+    Safe to run repeatedly. Used as a one-shot init job:
+    `python -c "import asyncio, database; asyncio.run(database.init_db())"`
     """
+    import models  # noqa: F401 - registers all tables on Base.metadata
+
     async with engine.begin() as conn:
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        # Trigram operator classes for the job search indexes
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         
         # Create all tables (User, Job, UserProfile, etc.)
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+
+        # create_all never alters existing tables: migrate fp32 embeddings to halfvec
+        # and add new (nullable) columns explicitly
+        await conn.run_sync(_convert_vector_columns)
+        await conn.run_sync(_add_missing_columns)
+
+        # create_all skips indexes on tables that already exist, so add new ones explicitly
+        await conn.run_sync(_create_missing_indexes)
\ No newline at end of file
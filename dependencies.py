@@ -1,10 +1,13 @@
+from datetime import UTC, datetime
 from typing import Annotated
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from routers.auth import verify_access_token
+from routers.auth import decode_access_token, token_fingerprint
 
 from database import get_db
 import models
@@ -12,41 +15,70 @@ import models
 # Defines the "Login" URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
+# Verified Token Cache: sha256(token) -> (user_id, exp, column snapshot of the User)
+# Short TTL so role changes / deleted accounts converge quickly.
+_user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
+
+def _snapshot_user(user: models.User) -> dict:
+    """ Copies the column values of a User so it can be rebuilt without a DB query. """
+    return {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs}
+
+def invalidate_user_cache(user_id: int) -> None:
+    """
+    Drops every cached token that belongs to `user_id`.
+    Call this after updating or deleting a user so the next request sees fresh data.
+    """
+    for key, (cached_user_id, _, _) in list(_user_cache.items()):
+        if cached_user_id == user_id:
+            _user_cache.pop(key, None)
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[AsyncSession, Depends(get_db)],
 ) -> models.User:
     """
     **Authentication Dependency**
-    
+
     Protect any route by adding this dependency.
     1. Extracts the Bearer Token from the header.
-    2. Decodes and verifies the token.
-    3. Fetches the User from the database.
-    
+    2. Returns the cached User if this token was verified recently (skips steps 3-4).
+    3. Decodes and verifies the token.
+    4. Fetches the User from the database.
+
     **Returns:** The authenticated `User` object.
     **Raises:** `401 Unauthorized` if token is invalid or user missing.
     """
-    # 1. Decode Token
-    user_id = verify_access_token(token)
-    if user_id is None:
+    # 1. Cache Hit: rebuild the User and attach it to this session without a SELECT
+    cache_key = token_fingerprint(token)
+    cached = _user_cache.get(cache_key)
+    if cached and cached[1] > datetime.now(UTC).timestamp():
+        user = models.User(**cached[2])
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    # 2. Decode Token
+    payload = decode_access_token(token)
+    if payload is None:
+        _user_cache.pop(cache_key, None)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # 2. Convert ID safely
+    # 3. Convert ID safely
     try:
-        user_id_int = int(user_id)
+        user_id_int = int(payload.get("sub"))
     except (TypeError, ValueError):
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
-    # 3. Fetch User from DB
-    result = await db.execute(select(models.User).where(models.User.id == user_id_int))
-    user = result.scalars().first()
-    
+    # 4. Fetch User from DB
+    user = await db.get(models.User, user_id_int)
+
     if not user:
+        _user_cache.pop(cache_key, None)
         raise HTTPException(status_code=401, detail="User not found")
-        
-    return user
\ No newline at end of file
+
+    _user_cache[cache_key] = (user.id, payload["exp"], _snapshot_user(user))
+    return user
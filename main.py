@@ -1,13 +1,16 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from sqlalchemy import text
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
 import logging
-from database import Base, engine
+from config import get_settings
+from database import engine, init_db, warm_up_pool
+from services.ai import cache_stats, warm_up_model
+from services.embedding_batcher import embedder
 from routers import jobs, users, auth, applications, profiles
 
 # Configure logging to track server events and errors
@@ -21,39 +24,27 @@ async def lifespan(app: FastAPI):
     This function runs *before* the app starts receiving requests and *after* it shuts down.
     
     **Startup Logic:**
-    1. Connects to the database.
-    2. Enables the `vector` extension (Critical for AI features).
-    3. Creates all tables if they don't exist.
+    1. If `RUN_MIGRATIONS_ON_STARTUP` is enabled, runs `init_db()`
+       (enables `vector` extension + creates missing tables).
+       Otherwise the schema is expected to be created by a one-shot init job.
+    2. Warms up the connection pool (opens the first DB connection).
+    3. If `PRELOAD_EMBEDDING_MODEL` is enabled, loads the embedding model (in a thread).
     
     **Shutdown Logic:**
-    1. Disposes of the database engine connection to free resources.
-    """
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """
-    **Application Lifespan Manager**
-    
-    This function runs *before* the app starts receiving requests and *after* it shuts down.
-    
-    **Startup Logic:**
-    1. Connects to the database.
-    2. Enables the `vector` extension (Critical for AI features).
-    3. Creates all tables if they don't exist.
-    
-    **Shutdown Logic:**
-    1. Disposes of the database engine connection to free resources.
+    1. Stops the embedding micro-batcher.
+    2. Disposes of the database engine connection to free resources.
     """
     # --- STARTUP ---
-    async with engine.begin() as conn:
-        # Enable pgvector extension for AI embeddings
-        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        
-        # Create all tables defined in models.py
-        await conn.run_sync(Base.metadata.create_all)
+    if get_settings().run_migrations_on_startup:
+        await init_db()
+    await warm_up_pool()
+    if get_settings().preload_embedding_model:
+        await run_in_threadpool(warm_up_model)
     
     yield # App runs here
     
     # --- SHUTDOWN ---
+    await embedder.close()
     await engine.dispose()
 
 # Initialize FastAPI App
@@ -61,15 +52,18 @@ app = FastAPI(
     title="LokerIn API",
     version="1.0.0",
     lifespan=lifespan, # Attach the startup/shutdown logi
+    default_response_class=ORJSONResponse, # orjson: faster encoding, native datetime support
     docs_url="/docs", # Swagger UI URL
     redoc_url="/redoc" # ReDoc URL
 )
 
 # --- MIDDLEWARE ---
+allowed_origins = get_settings().allowed_origins
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"], # Replace "*" with specific domains
-    allow_credentials=True,
+    allow_origins=allowed_origins, # Set ALLOWED_ORIGINS to your frontend domains
+    # Credentials are only valid with an explicit origin list (not "*")
+    allow_credentials="*" not in allowed_origins,
     allow_methods=["*"],
     allow_headers=["*"],
 )
@@ -99,8 +93,9 @@ app.include_router(applications.router, prefix=f"{API_PREFIX}/applications", tag
 async def health_check():
     """
     Health check endpoint to verify the server is running.
+    Also reports the embedding cache statistics of this worker.
     """
-    return {"status": "ok", "service": "LokerIn API v1"}
+    return {"status": "ok", "service": "LokerIn API v1", "embedding_cache": cache_stats()}
 
 # --- EXCEPTION HANDLERS ---
 
@@ -109,7 +104,7 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     """
     Catches standard HTTP errors (404, 403, 400) and formats them as JSON.
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"success": False, "error_code": exc.status_code, "message": exc.detail},
     )
@@ -121,11 +116,11 @@ async def database_error_handler(request: Request, exc: SQLAlchemyError):
     Logs the full error on the server for debugging.
     """
     logger.error(
-        f"Database error at {request.method} {request.url}: {exc}", 
+        "Database error at %s %s: %s", request.method, request.url, exc,
         exc_info=True
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False, 
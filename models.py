@@ -1,9 +1,9 @@
 from __future__ import annotations
 from enum import Enum
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Boolean, Text, Enum as SQLAEnum, ForeignKey, DateTime, ARRAY, UniqueConstraint
+from sqlalchemy import func, Column, Integer, String, Boolean, Text, Enum as SQLAEnum, ForeignKey, DateTime, ARRAY, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from pgvector.sqlalchemy import Vector 
+from pgvector.sqlalchemy import HALFVEC
 import enum
 from database import Base
 
@@ -25,6 +25,10 @@ class ApplicationStatus(str, enum.Enum):
     ACCEPTED = "ACCEPTED"
     REJECTED = "REJECTED"
 
+def _enum_values(enum_cls: type[enum.Enum]) -> list[str]:
+    """ Labels for the Postgres ENUM type: the member values (identical to the names here). """
+    return [member.value for member in enum_cls]
+
 
 # --- MODELS ---
 class User(Base):
@@ -36,12 +40,16 @@ class User(Base):
 
     # Core Auth Data
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    username: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
-    email: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
+    # Uniqueness is case-insensitive, enforced by the lower() indexes below the class
+    username: Mapped[str] = mapped_column(String(50), nullable=False)
+    email: Mapped[str] = mapped_column(String(120), nullable=False)
     hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
     
     # Access Control
-    role: Mapped[Role] = mapped_column(SQLAEnum(Role), default=Role.SEEKER)
+    role: Mapped[Role] = mapped_column(
+        SQLAEnum(Role, name="role", native_enum=True, values_callable=_enum_values),
+        default=Role.SEEKER,
+    )
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     
     # Profile Data (Merged & Nullable)
@@ -65,6 +73,11 @@ class User(Base):
     def image_path(self) -> str:
         return f"/static/profile_pics/{self.image_file}"
 
+# Username/email lookups are case-insensitive (`lower(col) = :value`), so index the expression.
+# Unique: 'A@x.com' and 'a@x.com' are the same account.
+Index("ix_users_email_lower", func.lower(User.email), unique=True)
+Index("ix_users_username_lower", func.lower(User.username), unique=True)
+
 class UserProfile(Base):
     """
     **User Profile Table (CV Data)**
@@ -86,11 +99,34 @@ class UserProfile(Base):
     resume_url = Column(String, nullable=True)
 
     # AI BRAIN: The Vector Embedding of the user's CV
-    profile_embedding = Column(Vector(384))
+    # halfvec (fp16): half the storage/bandwidth of `vector`, negligible recall loss at 384 dims
+    profile_embedding = Column(HALFVEC(384))
+    # The embedding is computed in the background after a CV upload.
+    # Key (hash) of the text the embedding must belong to: a slow task from an older
+    # upload can't overwrite the vector of a newer CV.
+    embedding_key = Column(String(32), nullable=True)
+    embedding_failed = Column(Boolean, default=False, nullable=True)
 
     # Relationship
     user = relationship("User", back_populates="profile")
 
+    @property
+    def embedding_status(self) -> str:
+        if self.profile_embedding is not None:
+            return "ready"
+        return "failed" if self.embedding_failed else "pending"
+
+    # ANN index so similarity search doesn't scan every profile
+    __table_args__ = (
+        Index(
+            "ix_user_profiles_embedding_hnsw",
+            "profile_embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"profile_embedding": "halfvec_cosine_ops"},
+        ),
+    )
+
 class Job(Base):
     """
     **Job Table**
@@ -108,16 +144,19 @@ class Job(Base):
     is_remote: Mapped[bool] = mapped_column(Boolean, default=False)
 
     # Job Types
-    job_type: Mapped[JobType] = mapped_column(SQLAEnum(JobType), default=JobType.FULL_TIME)
+    job_type: Mapped[JobType] = mapped_column(
+        SQLAEnum(JobType, name="jobtype", native_enum=True, values_callable=_enum_values),
+        default=JobType.FULL_TIME,
+    )
     
     # Skills 
     skills: Mapped[list|str] = mapped_column(ARRAY(String), nullable=False, default=list)
     
-    # AI BRAIN: The Vector Embedding of the job description
-    job_embedding: Mapped[int] = mapped_column(Vector(384), nullable=True)
+    # AI BRAIN: The Vector Embedding of the job description (fp16, see UserProfile.profile_embedding)
+    job_embedding: Mapped[int] = mapped_column(HALFVEC(384), nullable=True)
 
     # Owner (Recruiter)
-    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
     
     # Metadata 
     job_posted: Mapped[datetime] = mapped_column(
@@ -127,7 +166,48 @@ class Job(Base):
     # Relationships
     owner: Mapped["User"] = relationship(back_populates="jobs")
     applications = relationship("Application", back_populates="job", cascade="all, delete-orphan")
-    
+
+    __table_args__ = (
+        # ANN index for the "/match" cosine similarity search (ORDER BY distance LIMIT n)
+        Index(
+            "ix_jobs_embedding_hnsw",
+            "job_embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"job_embedding": "halfvec_cosine_ops"},
+        ),
+        # ANN index for the manual "/match" search, which orders by L2 distance (`<->`)
+        Index(
+            "ix_jobs_embedding_l2_hnsw",
+            "job_embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"job_embedding": "halfvec_l2_ops"},
+        ),
+        # Trigram indexes (pg_trgm) so `ILIKE '%term%'` search doesn't scan the whole table
+        Index(
+            "ix_jobs_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_jobs_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+    )
+
+# Listing order: `ORDER BY job_posted DESC, id DESC` (newest first, id breaks ties for keyset cursors)
+Index("ix_jobs_job_posted_id", Job.job_posted.desc(), Job.id.desc())
+# Same order restricted to remote jobs (partial index, only remote rows are stored)
+Index(
+    "ix_jobs_remote_job_posted_id",
+    Job.job_posted.desc(),
+    Job.id.desc(),
+    postgresql_where=Job.is_remote.is_(True),
+)
 
 class Application(Base):
     """
@@ -138,14 +218,18 @@ class Application(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     
-    # Who applied?
+    # Who applied? (lookups by user_id use the unique (user_id, job_id) index below)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
-    # To which job?
+    # To which job? (lookups by job_id use the (job_id, status) index below)
     job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
     
     # Status (Pending -> Accepted/Rejected)
-    status = Column(SQLAEnum(ApplicationStatus), default=ApplicationStatus.PENDING, nullable=False)
+    status = Column(
+        SQLAEnum(ApplicationStatus, name="applicationstatus", native_enum=True, values_callable=_enum_values),
+        default=ApplicationStatus.PENDING,
+        nullable=False,
+    )
     
     # CV Snapshot 
     cv_file = Column(String, nullable=True) 
@@ -156,7 +240,9 @@ class Application(Base):
     user = relationship("User", back_populates="applications")
     job = relationship("Job", back_populates="applications")
 
-    # Constraint: Prevent a user from applying to the same job twice
     __table_args__ = (
+        # Constraint: Prevent a user from applying to the same job twice
         UniqueConstraint('user_id', 'job_id', name='unique_application_per_user'),
+        # Applicants per job (optionally filtered by status)
+        Index("ix_applications_job_id_status", "job_id", "status"),
     )
\ No newline at end of file
@@ -1,7 +1,10 @@
+from collections.abc import AsyncIterator
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import exists, lambda_stmt, select, update
+from sqlalchemy.exc import IntegrityError
 from typing import Annotated
 
 from database import get_db
@@ -12,6 +15,29 @@ from schemas import APIResponse, ApplicationResponse, ApplicationCreate, Applica
 
 router = APIRouter()
 
+# Columns needed by `ApplicationResponse`; list endpoints select only these (no ORM instances)
+APPLICATION_RESPONSE_COLUMNS = tuple(
+    getattr(models.Application, field) for field in ApplicationResponse.model_fields
+)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def stream_applications_ndjson(db: AsyncSession, query) -> StreamingResponse:
+    """
+    **NDJSON Streaming Response**
+
+    Streams the rows of `query` (selecting `APPLICATION_RESPONSE_COLUMNS`) as one JSON
+    object per line. Rows are fetched from a server-side cursor in batches of 500 and
+    encoded straight with orjson, so memory stays flat however many applications there are.
+    Run any permission checks *before* calling this: errors can't be raised mid-stream.
+    """
+    async def lines() -> AsyncIterator[bytes]:
+        result = await db.stream(query, execution_options={"yield_per": 500})
+        async for row in result:
+            yield orjson.dumps(dict(row._mapping)) + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
 # --- JOB SEEKER ENDPOINTS----
 
 @router.post("/{job_id}", response_model=APIResponse[ApplicationResponse])
@@ -30,41 +56,48 @@ async def apply_to_job(
     1. **Job Existence:** Validates if the `job_id` exists in the database.
     2. **Self-Application:** Prevents a Recruiter (Owner) from applying to their own job.
     3. **Duplicate Check:** Ensures the user hasn't already applied to this job to prevent spam.
+    4. **CV Fallback:** Uses the CV from the user's Profile if no `cv_file` is given.
+    
+    All of the above is read in a single query (job owner, duplicate flag, profile CV).
     
     **Returns:**
     - The newly created Application object with status `PENDING`.
     """
+    # 1-3. Job owner + "already applied" flag + profile CV in a single round-trip
+    # lambda_stmt caches the built statement; job_id/user_id become bound parameters.
+    user_id = current_user.id
+    result = await db.execute(lambda_stmt(
+        lambda: select(
+            models.Job.owner_id,
+            exists().where(
+                models.Application.job_id == job_id,
+                models.Application.user_id == user_id,
+            ).label("applied"),
+            select(models.UserProfile.resume_url)
+            .where(models.UserProfile.user_id == user_id)
+            .scalar_subquery()
+            .label("profile_cv"),
+        ).where(models.Job.id == job_id)
+    ))
+    job_check = result.one_or_none()
+
     # 1. Check if Job Exists
-    result = await db.execute(select(models.Job).where(models.Job.id == job_id))
-    job = result.scalar_one_or_none()
-    
-    if not job:
+    if job_check is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
 
     # 2. Prevent Owner from applying to their own job 
-    if job.owner_id == current_user.id:
+    if job_check.owner_id == current_user.id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You cannot apply to your own job.")
 
     # 3. Check if User Already Applied 
-    existing_app = await db.execute(
-        select(models.Application)
-        .where(models.Application.job_id == job_id)
-        .where(models.Application.user_id == current_user.id)
-    )
-    if existing_app.scalar_one_or_none():
+    if job_check.applied:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already applied to this job.")
     
     final_cv_file = application_data.cv_file
     # If user didn't provide a specific file, try to grab from their Profile
     if not final_cv_file:
-        # Fetch the User Profile
-        profile_result = await db.execute(
-            select(models.UserProfile).where(models.UserProfile.user_id == current_user.id)
-        )
-        user_profile = profile_result.scalar_one_or_none()
-        
-        if user_profile and user_profile.resume_url:
-            final_cv_file = user_profile.resume_url
+        if job_check.profile_cv:
+            final_cv_file = job_check.profile_cv
         else:
             raise HTTPException(
                 status_code=400, 
@@ -81,8 +114,13 @@ async def apply_to_job(
     )
 
     db.add(new_application)
-    await db.commit()
-    await db.refresh(new_application)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request won the race; the unique constraint is the final guard
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already applied to this job.")
+    # No refresh: every column is set client-side or by the INSERT, and expire_on_commit=False keeps them
 
     return APIResponse(
         success=True,
@@ -101,16 +139,17 @@ async def get_my_applications(
     Retrieves all jobs that the *current logged-in user* has applied to.
     
     **Note:**
-    - Uses `selectinload(models.Application.job)` to efficiently fetch the related Job details 
-      (Title, Company, etc.) in a single query to avoid the "N+1" problem.
+    - Selects only the columns in `ApplicationResponse` and builds the responses with
+      `model_construct` (DB data is already trusted), skipping ORM object hydration.
     """
-    query = (
-        select(models.Application)
-        .where(models.Application.user_id == current_user.id)
-        .options(selectinload(models.Application.job)) # Load Job data related to the application
+    user_id = current_user.id
+    query = lambda_stmt(
+        lambda: select(*APPLICATION_RESPONSE_COLUMNS)
+        .where(models.Application.user_id == user_id)
     )
-    result = await db.execute(query)
-    applications = result.scalars().all()
+    # Server-side cursor: rows arrive in batches of 100 instead of one big buffer
+    result = await db.stream(query, execution_options={"yield_per": 100})
+    applications = [ApplicationResponse.model_construct(**row._mapping) async for row in result]
 
     return APIResponse(
         success=True,
@@ -118,6 +157,22 @@ async def get_my_applications(
         data=applications
     )
 
+@router.get("/me/stream", response_class=StreamingResponse)
+async def stream_my_applications(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)]
+):
+    """
+    **Stream My Application History (NDJSON)**
+
+    Same data as `GET /me`, but streamed as newline-delimited JSON
+    (one `ApplicationResponse` object per line) instead of a single envelope.
+    """
+    query = select(*APPLICATION_RESPONSE_COLUMNS).where(
+        models.Application.user_id == current_user.id
+    )
+    return stream_applications_ndjson(db, query)
+
 
 # --- JOB OWNER ENDPOINTS ---
 
@@ -137,26 +192,34 @@ async def review_application(
     - `application_id`: ID of the application to review.
     - `status_update`: JSON body containing the new status (enum).
     """
-    # 1. Find application and its job
-    query = (
-        select(models.Application)
-        .where(models.Application.id == application_id)
-        .options(selectinload(models.Application.job)) 
+    # 1. Update the status only if the application belongs to one of the current user's jobs.
+    # Ownership is enforced in SQL, so it's a single round-trip with no read-then-write race.
+    result = await db.execute(
+        update(models.Application)
+        .where(
+            models.Application.id == application_id,
+            models.Application.job.has(models.Job.owner_id == current_user.id),
+        )
+        .values(status=status_update.status)
+        .returning(*APPLICATION_RESPONSE_COLUMNS)
+        .execution_options(synchronize_session=False)
     )
-    result = await db.execute(query)
-    application = result.scalar_one_or_none()
+    row = result.one_or_none()
 
-    if not application:
-        raise HTTPException(status_code=404, detail="Application not found")
+    # 2. Nothing updated: tell "not found" and "not yours" apart
+    if row is None:
+        found = await db.scalar(
+            select(exists().where(models.Application.id == application_id))
+        )
+        if not found:
+            raise HTTPException(status_code=404, detail="Application not found")
 
-    # 2. Only the owner of the job can change the status
-    if application.job.owner_id != current_user.id:
+        # Only the owner of the job can change the status
         raise HTTPException(status_code=403, detail="You do not have permission to review this application.")
 
-    # 3. Update and Save
-    application.status = status_update.status
+    # 3. Save
     await db.commit()
-    await db.refresh(application)
+    application = ApplicationResponse.model_construct(**row._mapping)
 
     return APIResponse(
         success=True,
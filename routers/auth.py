@@ -1,24 +1,52 @@
 from datetime import UTC, timedelta, datetime
 from typing import Annotated
+import hashlib
+import time
+from cachetools import TLRUCache
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 import jwt
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pwdlib import PasswordHash 
-from config import settings
+from pwdlib.hashers.argon2 import Argon2Hasher
+from config import get_settings
 import models
 from database import get_db
 from schemas import Token
 
 router = APIRouter()
 
-# Password Context: Configures hashing algorithms (Argon2)
-password_hash = PasswordHash.recommended()
+# Password Context: Configures hashing algorithms (Argon2id, parameters from settings)
+_settings = get_settings()
+password_hash = PasswordHash((
+    Argon2Hasher(
+        time_cost=_settings.argon2_time_cost,
+        memory_cost=_settings.argon2_memory_cost,
+        parallelism=_settings.argon2_parallelism,
+    ),
+))
+
+# JWT codec: one PyJWT instance and the signing key bytes, built once at import
+_jwt = jwt.PyJWT()
+_jwt_key = _settings.secret_key.get_secret_value().encode()
+_jwt_decode_options = {"require": ["exp", "sub"], "verify_aud": False} # Force check for expiration and subject
 
 # Defines where the user sends their credentials to get a token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/users/token")
 
+# Decoded JWT Cache: sha256(token) -> payload
+# An entry lives at most 30s and never past the token's own `exp`.
+# Trade-off: a token that must stop working early (no revocation list yet) may be
+# accepted for up to 30 more seconds.
+JWT_CACHE_TTL_SECONDS = 30
+_jwt_cache: TLRUCache = TLRUCache(
+    maxsize=10_000,
+    ttu=lambda _key, payload, now: min(now + JWT_CACHE_TTL_SECONDS, payload["exp"]),
+    timer=time.time,
+)
+
 
 # --- HELPERS ---
 
@@ -35,6 +63,27 @@ def verify_password(plain_password: str, hashed_password:str) -> bool:
     """
     return password_hash.verify(plain_password, hashed_password) 
 
+async def ahash_password(password: str) -> str:
+    """
+    Async version of `hash_password`.
+    Argon2 is deliberately slow (tens of ms), so it runs in the threadpool
+    instead of blocking the event loop for every other request.
+    """
+    return await run_in_threadpool(password_hash.hash, password)
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Async version of `verify_password` (runs in the threadpool).
+    """
+    return await run_in_threadpool(password_hash.verify, plain_password, hashed_password)
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verifies the password and, if the stored hash was made with different Argon2
+    parameters, also returns a fresh hash so the caller can upgrade it (runs in the threadpool).
+    """
+    return await run_in_threadpool(password_hash.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data:dict, expires_delta: timedelta | None = None) -> str:
     """ 
     **Create JWT Access Token**
@@ -45,6 +94,7 @@ def create_access_token(data:dict, expires_delta: timedelta | None = None) -> st
     - `sub` (Subject): User ID.
     - `exp` (Expiration): When the token becomes invalid.
     """
+    settings = get_settings()
     to_encode = data.copy()
 
     # Calculate expiration time
@@ -57,32 +107,54 @@ def create_access_token(data:dict, expires_delta: timedelta | None = None) -> st
     to_encode.update({"exp": expire})
 
     # Sign the token using users SECRET_KEY and Algorithm (HS256)
-    encode_jwt = jwt.encode(
-        to_encode,
-        settings.secret_key.get_secret_value(),
-        algorithm=settings.algorithm,
-    )
+    encode_jwt = _jwt.encode(to_encode, _jwt_key, algorithm=settings.algorithm)
 
     return encode_jwt
 
-def verify_access_token(token:str) -> str | None:
+def token_fingerprint(token: str) -> bytes:
+    """
+    Cache key for a token. Raw tokens are never stored as keys.
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+def decode_access_token(token: str) -> dict | None:
     """ 
-    **Verify JWT Token**
+    **Decode JWT Token**
     
     Decodes a token to ensure it hasn't been tampered with and is not expired.
-    Returns the `user_id` (sub) if valid, or None if invalid.
+    Returns the full payload (`sub`, `exp`, ...) if valid, or None if invalid.
+    
+    Valid payloads are cached (see `_jwt_cache`), so repeated requests with the
+    same token skip the HMAC check and JSON parsing.
     """
+    key = token_fingerprint(token)
+    payload = _jwt_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
-        payload = jwt.decode(
+        payload = _jwt.decode(
             token,
-            settings.secret_key.get_secret_value(),
-            algorithms=[settings.algorithm],
-            options={"require": ["exp", "sub"]}, # Force check for expiration and subject
+            _jwt_key,
+            algorithms=[_settings.algorithm],
+            options=_jwt_decode_options,
         )
     except jwt.InvalidTokenError:
         return None
-    else:
-        return payload.get("sub")
+
+    _jwt_cache[key] = payload
+    return payload
+
+def verify_access_token(token:str) -> str | None:
+    """ 
+    **Verify JWT Token**
+    
+    Returns the `user_id` (sub) if the token is valid, or None if invalid.
+    """
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    return payload.get("sub")
     
 
 # --- AUTH ENDPOINT ---
@@ -108,15 +180,24 @@ async def login_for_access_token(
     user = result.scalars().first()
 
     # 2. Validate Credentials
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    is_valid, updated_hash = False, None
+    if user:
+        is_valid, updated_hash = await averify_and_update_password(form_data.password, user.hashed_password)
+
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Lazily migrate hashes created with older Argon2 parameters
+    if updated_hash:
+        user.hashed_password = updated_hash
+        await db.commit()
+
     # 3. Generate token
-    access_token_expire = timedelta(minutes=settings.access_token_expire_minutes)
+    access_token_expire = timedelta(minutes=get_settings().access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": str(user.id)}, # Subject is the User ID
         expires_delta=access_token_expire,
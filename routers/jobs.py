@@ -1,18 +1,42 @@
+import base64
+import binascii
+from datetime import datetime
 from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func, or_, and_
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func, or_, and_, text, tuple_
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.orm import raiseload, selectinload
 import models
+from config import get_settings
 from database import get_db
 from schemas import JobCreate, JobResponse, JobUpdate, APIResponse, MatchRequest, JobMatchResponse, ApplicationResponse
 from dependencies import get_current_user
-from services.ai import get_embedding
+from services.ai import get_embedding_async
+from .applications import APPLICATION_RESPONSE_COLUMNS, stream_applications_ndjson
 
 router = APIRouter()
 
+async def set_hnsw_ef_search(db: AsyncSession) -> None:
+    """ Sets the HNSW search width for the current transaction only (`SET LOCAL`). """
+    # SET can't take bind parameters; the value is an int from settings
+    await db.execute(text(f"SET LOCAL hnsw.ef_search = {int(get_settings().hnsw_ef_search)}"))
+
+def encode_job_cursor(job: models.Job) -> str:
+    """ Opaque keyset cursor for the listing: base64("<job_posted iso>:<id>"). """
+    raw = f"{job.job_posted.isoformat()}:{job.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_job_cursor(cursor: str) -> tuple[datetime, int]:
+    """ Reverses `encode_job_cursor`. Raises `400 Bad Request` on a malformed cursor. """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        posted, job_id = raw.rsplit(":", 1)
+        return datetime.fromisoformat(posted), int(job_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
 # --- AI ENDPOINT ---
 
 @router.get("/match", response_model=APIResponse[list[JobMatchResponse]])
@@ -33,19 +57,30 @@ async def match_jobs_profile(
     )
     profile = result.scalar_one_or_none()
 
-    if not profile or profile.profile_embedding is None:
+    if not profile:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You must upload a CV first so we can match you!"
         )
+    if profile.embedding_status == "failed":
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="We couldn't process your CV. Please upload it again."
+        )
+    if profile.embedding_status == "pending":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Your CV is still being processed. Please try again in a moment."
+        )
     
-    # 2. Vector Search Query (Cosine Similarity)
+    # 2. Vector Search Query (Cosine Similarity, served by the HNSW index)
+    await set_hnsw_ef_search(db)
     query = (
         select(
             models.Job,
             models.Job.job_embedding.cosine_distance(profile.profile_embedding).label("distance")
         )
-        .options(selectinload(models.Job.owner))
+        .options(selectinload(models.Job.owner), raiseload("*"))
         .order_by("distance") # Smallest distance = Best match
         .limit(limit)
     )
@@ -59,14 +94,13 @@ async def match_jobs_profile(
         # Cosine Distance is 0 to 2. 
         # 0 = Perfect Match, 1 = No Match, 2 = Opposite.
         # Formula: Score = 1 - Distance (clamped to 0%)
-        raw_score = 1 - distance
-        match_percentage = max(0, min(100, raw_score*100))
-    
-    job_data = JobMatchResponse(
-        **job.__dict__,
-        match_score=round(match_percentage, 1)
-    )
-    response_data.append(job_data)
+        match_percentage = max(0.0, 1 - distance) * 100
+
+        job_data = JobMatchResponse(
+            **job.__dict__,
+            match_score=round(match_percentage, 1)
+        )
+        response_data.append(job_data)
 
     return APIResponse(
         success=True,
@@ -87,13 +121,14 @@ async def match_jobs_manual(
     """
     # A. Generate the User's Vector from input keywords
     user_query = " ".join(match_data.skills)
-    user_embedding = get_embedding(user_query)
+    user_embedding = await get_embedding_async(user_query)
 
     # B. The Vector Search Query (PostgreSQL)
-    # Uses L2 Distance (Euclidean) to find closest vectors
+    # Uses L2 Distance (Euclidean) to find closest vectors (served by the L2 HNSW index)
+    await set_hnsw_ef_search(db)
     query = (
         select(models.Job, models.Job.job_embedding.l2_distance(user_embedding).label("distance"))
-        .options(selectinload(models.Job.owner))
+        .options(selectinload(models.Job.owner), raiseload("*"))
         .order_by(models.Job.job_embedding.l2_distance(user_embedding))
         .limit(match_data.limit)
     )
@@ -121,11 +156,55 @@ async def match_jobs_manual(
 
 # --- PUBLIC/JOB SEEKER ENDPOINTS ---
 
+def job_filters(
+    search: Optional[str],
+    location: Optional[str],
+    job_type: Optional[models.JobType],
+    is_remote: Optional[bool],
+    allow_remote_hybrid: bool,
+    min_salary: Optional[int],
+) -> list:
+    """
+    Builds the WHERE clauses for the job listing.
+    Shared by the data query and the count query, so both filter identically.
+    """
+    filters = []
+
+    if search:
+        # Served by the pg_trgm GIN indexes on title/description (for terms of 3+ chars)
+        filters.append(
+            models.Job.title.ilike(f"%{search}%") |
+            models.Job.description.ilike(f"%{search}%")
+        )
+    if min_salary:
+        filters.append(models.Job.salary >= min_salary)
+    if job_type:
+        filters.append(models.Job.job_type == job_type)
+    if location:
+        if allow_remote_hybrid:
+            # Hybrid Logic: (Location LIKE 'Jakarta') OR (Remote = True)
+            filters.append(
+                or_(
+                    models.Job.location.ilike(f"%{location}"),
+                    models.Job.is_remote == True
+                )
+            )
+        else:
+            # Standard Logic: Location MUST match (e.g 'Jakarta')
+            filters.append(models.Job.location.ilike(f"%{location}%"))
+    
+    # Standard Remote Filter (Only if not using hybrid)
+    if is_remote is not None:
+        filters.append(models.Job.is_remote == is_remote)
+
+    return filters
+
 @router.get("", response_model=APIResponse[list[JobResponse]])
 async def get_jobs(
     db: Annotated[AsyncSession, Depends(get_db)],
     # Pagination params
     page: int = Query(1, ge=1, description="page number"), # ge= greater than or equal to
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page (keyset pagination)"),
     limit: int = Query(10, ge=1, le=100, description="Items per page"),
     # Filter params
     search: Optional[str] = None,
@@ -147,56 +226,64 @@ async def get_jobs(
     - `min_salary`: Filters jobs offering at least this salary.
     
     **Pagination:**
-    - Uses `offset/limit` logic. Returns total count and pages in metadata.
+    - Pass `cursor` (the `next_cursor` from the previous response) for keyset pagination:
+      each page is an index seek on `(job_posted, id)`, no matter how deep.
+    - Without `cursor`, falls back to `page`-based `offset/limit` and returns total count and pages in metadata.
     """
 
     # Base Query (Filters only)
-    query = select(models.Job)
-
-    # Apply filters
-    if search:
-        query = query.where(
-            models.Job.title.ilike(f"%{search}%") |
-            models.Job.description.ilike(f"%{search}%")
+    filters = job_filters(search, location, job_type, is_remote, allow_remote_hybrid, min_salary)
+    query = select(models.Job).where(*filters)
+
+    # Newest first; id breaks ties so the order (and the cursor) is stable
+    listing_order = (models.Job.job_posted.desc(), models.Job.id.desc())
+
+    # Keyset Pagination: seek past the last row of the previous page
+    if cursor:
+        cursor_posted, cursor_id = decode_job_cursor(cursor)
+        result = await db.execute(
+            query.where(tuple_(models.Job.job_posted, models.Job.id) < (cursor_posted, cursor_id))
+            .options(selectinload(models.Job.owner), raiseload("*")) # Load Recruiter details
+            .order_by(*listing_order)
+            .limit(limit)
+        )
+        jobs = result.scalars().all()
+
+        return APIResponse(
+            success=True,
+            message="Jobs retrieved successfully",
+            data=jobs,
+            meta={
+                "limit": limit,
+                "count": len(jobs),
+                "next_cursor": encode_job_cursor(jobs[-1]) if len(jobs) == limit else None
+            }
         )
-    if min_salary:
-        query = query.where(models.Job.salary >= min_salary)
-    if job_type:
-        query = query.where(models.Job.job_type == job_type)
-    if location:
-        if allow_remote_hybrid:
-            # Hybrid Logic: (Location LIKE 'Jakarta') OR (Remote = True)
-            query = query.where(
-                or_(
-                    models.Job.location.ilike(f"%{location}"),
-                    models.Job.is_remote == True
-                )
-            )
-        else:
-            # Standard Logic: Location MUST match (e.g 'Jakarta')
-            query = query.where(models.Job.location.ilike(f"%{location}%"))
-    
-    # Standard Remote Filter (Only if not using hybrid)
-    if is_remote is not None:
-        query = query.where(models.Job.is_remote == is_remote)
-
-    # Count Query
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total_items = total_result.scalar_one()
 
-    # Data Query
+    # Data Query + total count in one round-trip (COUNT(*) OVER () is computed before LIMIT)
     offset = (page - 1) * limit
 
     data_query = (
-        query.options(selectinload(models.Job.owner)) # Load Recruiter details
-        .order_by(models.Job.job_posted.desc()) # Newest first
+        query.add_columns(func.count().over().label("total_items"))
+        .options(selectinload(models.Job.owner), raiseload("*")) # Load Recruiter details
+        .order_by(*listing_order)
         .offset(offset)
         .limit(limit)
     )
 
     result = await db.execute(data_query)
-    jobs = result.scalars().all()
+    rows = result.all()
+    jobs = [job for job, _ in rows]
+
+    if rows:
+        total_items = rows[0].total_items
+    elif offset:
+        # Page past the end: no row to read the window count from, so count separately
+        # (plain filtered COUNT, no derived table, so the planner can use the narrowest index)
+        count_query = select(func.count(models.Job.id)).where(*filters)
+        total_items = (await db.execute(count_query)).scalar_one()
+    else:
+        total_items = 0
 
     # Calculate Pagination Metadata
     total_pages = (total_items + limit - 1) // limit
@@ -210,7 +297,8 @@ async def get_jobs(
             "limit": limit, 
             "total_items": total_items,
             "total_pages": total_pages,
-            "count": len(jobs)
+            "count": len(jobs),
+            "next_cursor": encode_job_cursor(jobs[-1]) if len(jobs) == limit and page < total_pages else None
         }
     )
 
@@ -223,7 +311,7 @@ async def get_job(job_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
     """
     result = await db.execute(
         select(models.Job)
-        .options(selectinload(models.Job.owner))
+        .options(selectinload(models.Job.owner), raiseload("*"))
         .where(models.Job.id == job_id)
     )
     job = result.scalars().first()
@@ -273,18 +361,17 @@ async def create_job(
     )
 
     # AI: Generate Vector
-    embedding = get_embedding(full_job_context)
+    embedding = await get_embedding_async(full_job_context)
 
     new_job = models.Job(
         **job_data.model_dump(),
         company=current_user.company_name,
-        owner_id=current_user.id,
+        owner=current_user, # Already loaded: the response needs no extra SELECT for the owner
         job_embedding=embedding # Store the "Job Brain"
     )
 
     db.add(new_job)
-    await db.commit()
-    await db.refresh(new_job, attribute_names=["owner"])
+    await db.commit() # expire_on_commit=False: id/job_posted stay populated from the INSERT
 
     return APIResponse(
         success=True, 
@@ -305,8 +392,12 @@ async def update_job(
     Allows recruiters to edit their own job posts.
     **Auto-Update:** If Title, Description, or Skills change, the AI Vector is re-calculated automatically.
     """
-    # 1. Get the job
-    result = await db.execute(select(models.Job).where(models.Job.id == job_id))
+    # 1. Get the job (with its owner, needed for the response)
+    result = await db.execute(
+        select(models.Job)
+        .options(selectinload(models.Job.owner))
+        .where(models.Job.id == job_id)
+    )
     job = result.scalars().first()
 
     if not job:
@@ -335,10 +426,9 @@ async def update_job(
         )
         
         # Generate and save new brain
-        job.job_embedding = get_embedding(full_job_context)
+        job.job_embedding = await get_embedding_async(full_job_context)
 
     await db.commit()
-    await db.refresh(job, attribute_names=["owner"])
     
     return APIResponse(
         success=True, 
@@ -384,26 +474,35 @@ async def get_job_applications(
     **Security Check:**
     - Verifies that `current_user.id` matches the `job.owner_id`. 
     - Prevents random users from seeing applicants for jobs they don't own.
+    
+    **Query Plan:**
+    - The ownership check is part of the applications query (JOIN jobs), so the
+      common case is a single round-trip. Only an empty result triggers a second,
+      cheap lookup to tell "not found" / "not yours" / "no applicants yet" apart.
     """
-    # 1. Verify the job exists AND belongs to the current user
-    result = await db.execute(
-        select(models.Job).where(models.Job.id == job_id)
+    # 1. Fetch applications, only if the job belongs to the current user (streamed in batches of 100)
+    # Only the response columns are selected; rows go straight into ApplicationResponse.
+    app_result = await db.stream(
+        select(*APPLICATION_RESPONSE_COLUMNS)
+        .join(models.Application.job)
+        .where(models.Job.id == job_id, models.Job.owner_id == current_user.id),
+        execution_options={"yield_per": 100},
     )
-    job = result.scalar_one_or_none()
+    applications = [ApplicationResponse.model_construct(**row._mapping) async for row in app_result]
 
-    # Ownership Check
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
+    # 2. Empty result: verify the job exists AND belongs to the current user
+    if not applications:
+        result = await db.execute(
+            select(models.Job.owner_id).where(models.Job.id == job_id)
+        )
+        owner_id = result.scalar_one_or_none()
 
-    if job.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You can only view applications for your own jobs.")
+        # Ownership Check
+        if owner_id is None:
+            raise HTTPException(status_code=404, detail="Job not found")
 
-    # 2. Fetch applications associated with this job_id
-    app_result = await db.execute(
-        select(models.Application)
-        .where(models.Application.job_id == job_id)
-    )
-    applications = app_result.scalars().all()
+        if owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="You can only view applications for your own jobs.")
 
     return APIResponse(
         success=True,
@@ -411,5 +510,33 @@ async def get_job_applications(
         data=applications
     )
 
+@router.get("/{job_id}/applications/stream", response_class=StreamingResponse)
+async def stream_job_applications(
+    job_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[models.User, Depends(get_current_user)]
+):
+    """
+    **Stream Applicants for a Job (NDJSON)**
+
+    Same data as `GET /{job_id}/applications`, streamed as newline-delimited JSON.
+    Meant for jobs with thousands of applicants.
+
+    **Security Check:**
+    - Ownership is verified before the stream starts (status codes can't change mid-stream).
+    """
+    # 1. Ownership Check
+    result = await db.execute(
+        select(models.Job.owner_id).where(models.Job.id == job_id)
+    )
+    owner_id = result.scalar_one_or_none()
+
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="You can only view applications for your own jobs.")
 
- 
+    # 2. Stream the applications
+    query = select(*APPLICATION_RESPONSE_COLUMNS).where(models.Application.job_id == job_id)
+    return stream_applications_ndjson(db, query)
@@ -1,62 +1,118 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+import logging
+from hashlib import blake2b
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from typing import Annotated
 
-from database import get_db
+from database import AsyncSessionLocal, get_db
 import models
 import schemas
 from dependencies import get_current_user
 from schemas import APIResponse, UserProfileResponse
+from services.ai import get_embedding_async, peek_embedding
 from services.resume import analyze_resume
 
 # Security: Limit file max 2 MB to prevent DoS
 MAX_FILE_SIZE = 2 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Every PDF file starts with this header
+PDF_MAGIC = b"%PDF-"
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def embedding_key(text: str) -> str:
+    """ Identifies the CV text a profile's embedding must belong to. """
+    return blake2b(text.encode(), digest_size=16).hexdigest()
+
+async def backfill_profile_embedding(profile_id: int, text: str) -> None:
+    """
+    **Background: CV Embedding**
+
+    Runs after the upload response is sent. Computes the embedding (through the
+    micro-batcher, so concurrent uploads share model calls) and stores it on the profile,
+    which flips its `embedding_status` to "ready". Uses its own session: the request's is closed.
+
+    Only writes while the profile still has this text's `embedding_key`: if a newer CV was
+    uploaded meanwhile, the outdated result is dropped. On failure the profile is marked
+    `failed`, so the user knows to upload again instead of waiting forever.
+    """
+    key = embedding_key(text)
+    profile = update(models.UserProfile).where(
+        models.UserProfile.id == profile_id,
+        models.UserProfile.embedding_key == key,
+    )
+    try:
+        embedding = await get_embedding_async(text)
+        async with AsyncSessionLocal() as db:
+            await db.execute(profile.values(profile_embedding=embedding, embedding_failed=False))
+            await db.commit()
+    except Exception:
+        logger.exception("Embedding CV for profile %s failed", profile_id)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(profile.values(embedding_failed=True))
+                await db.commit()
+        except Exception:
+            logger.exception("Could not mark the embedding of profile %s as failed", profile_id)
 
 @router.post("/", response_model=APIResponse[UserProfileResponse])
 async def create_or_update_profile(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: Annotated[models.User, Depends(get_current_user)],
+    background_tasks: BackgroundTasks,
     force_refresh: bool = False,
     file: UploadFile = File(...), 
 ):
     """
     **Upload CV & Auto-Generate Profile**
     
-    Parses a PDF Resume using internal tools (Regex/PyPDF).
+    Parses a PDF Resume using internal tools (Regex/PDFium, pypdf as fallback).
     
     **What it does:**
     1. Extracts Text from PDF.
     2. Extracts Skills (Regex matching).
     3. Calculates Experience Years (Date heuristic).
-    4. **Generates Vector Embedding** (User Brain).
-    5. Saves/Updates the UserProfile in the DB.
+    4. Saves/Updates the UserProfile in the DB.
+    5. **Generates Vector Embedding** (User Brain) in the background, after the response.
+       `embedding_status` is "pending" until it's stored (job matching needs it),
+       "failed" if it couldn't be computed.
     
     **Upsert Logic:**
     - If profile exists: Updates Skills/Vector/Years. Only updates Bio/Name if empty or `force_refresh=True`.
     - If new: Creates a fresh profile.
     """
-    # 1. Validate file type
-    if file.content_type != "application/pdf":
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only PDF files are allowed.")
-    
-    # 2. Read file content
-    file_content = await file.read()
-
-    # 3. Validate max size
-    file_size = len(file_content)
-    if file_size > MAX_FILE_SIZE:
+    # 1. Validate max size (when the upload declares it)
+    if file.size is not None and file.size > MAX_FILE_SIZE:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size is 2MB. Your file is {file_size / 1024 / 1024:.2f}MB"
+            detail=f"File too large. Maximum size is 2MB. Your file is {file.size / 1024 / 1024:.2f}MB"
         )
 
-    # 4. Analyze with AI (Service Layer)
-    analysis = analyze_resume(file_content)
+    # 2. Validate file type from the content itself (the client's content_type can't be trusted)
+    header = await file.read(len(PDF_MAGIC))
+    if header != PDF_MAGIC:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only PDF files are allowed.")
+    
+    # 3. Read the rest in 64 KB chunks, stop as soon as it exceeds the max size
+    buffer = bytearray(header)
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File too large. Maximum size is 2MB."
+            )
+    file_content = bytes(buffer)
+
+    # 4. Analyze with AI (Service Layer), PDF parsing runs off the event loop
+    analysis = await analyze_resume(file_content)
     if not analysis:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Could not extract file from PDF")
+    # Same CV text embedded before: use it now, otherwise it's computed in the background
+    embedding = peek_embedding(analysis["embedding_text"])
+    key = embedding_key(analysis["embedding_text"])
     
     # 5. Check if profile exists (Upsert Logic)
     result = await db.execute(
@@ -67,7 +123,9 @@ async def create_or_update_profile(
     if existing_profile:
         # UPDATE Existing Profile
         # Always update technical data (Vector, Skills, URL)
-        existing_profile.profile_embedding = analysis["embedding"]
+        existing_profile.profile_embedding = embedding
+        existing_profile.embedding_key = key
+        existing_profile.embedding_failed = False
         existing_profile.resume_url = file.filename
         existing_profile.skills = analysis["skills"]
         existing_profile.experience_years = analysis["experience_years"]
@@ -79,8 +137,9 @@ async def create_or_update_profile(
             existing_profile.full_name = analysis.get("extracted_name") or current_user.username
     
         db.add(existing_profile)
-        await db.commit()
-        await db.refresh(existing_profile)
+        await db.commit() # expire_on_commit=False: no reload needed
+        if embedding is None:
+            background_tasks.add_task(backfill_profile_embedding, existing_profile.id, analysis["embedding_text"])
         return APIResponse(
             success=True,
             message="Profile updated from CV!", 
@@ -95,13 +154,16 @@ async def create_or_update_profile(
             bio=analysis["text"][:500],
             skills=analysis["skills"],
             experience_years=analysis["experience_years"],
-            profile_embedding=analysis["embedding"],
+            profile_embedding=embedding,
+            embedding_key=key,
+            embedding_failed=False,
             resume_url=file.filename
         )
 
         db.add(new_profile)
-        await db.commit()
-        await db.refresh(new_profile)
+        await db.commit() # expire_on_commit=False: id comes back from the INSERT
+        if embedding is None:
+            background_tasks.add_task(backfill_profile_embedding, new_profile.id, analysis["embedding_text"])
         return APIResponse(
             success=True,
             message="Profile created from CV!", 
@@ -1,15 +1,15 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, select
+from sqlalchemy import exists, func, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import raiseload, selectinload
 
 import models
-from .auth import hash_password 
+from .auth import ahash_password
 from database import get_db
-from dependencies import get_current_user 
+from dependencies import get_current_user, invalidate_user_cache
 
 from schemas import (
     UserCreate, 
@@ -17,11 +17,40 @@ from schemas import (
     UserPublic, 
     UserUpdate, 
     JobResponse,  
+    JobListAdapter,
     APIResponse,
 ) 
 
 router = APIRouter()
 
+async def check_user_conflicts(
+    db: AsyncSession,
+    username: str | None = None,
+    email: str | None = None,
+    exclude_user_id: int | None = None,
+) -> None:
+    """
+    Raises `400 Bad Request` if `username` or `email` (case-insensitive) already
+    belongs to another user. Both are checked in a single query.
+    """
+    conditions = []
+    if username:
+        conditions.append(func.lower(models.User.username) == username.lower())
+    if email:
+        conditions.append(func.lower(models.User.email) == email.lower())
+    if not conditions:
+        return
+
+    query = select(models.User.username, models.User.email).where(or_(*conditions))
+    if exclude_user_id is not None:
+        query = query.where(models.User.id != exclude_user_id)
+    rows = (await db.execute(query)).all()
+
+    if username and any(row.username.lower() == username.lower() for row in rows):
+        raise HTTPException(status_code=400, detail="Username already exists")
+    if email and any(row.email.lower() == email.lower() for row in rows):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
 @router.post("", response_model=APIResponse[UserPrivate], status_code=status.HTTP_201_CREATED)
 async def create_user(
     user: UserCreate, 
@@ -40,19 +69,8 @@ async def create_user(
     - Hashes the password before saving.
     - Only sets `company_name` if the role is OWNER (Recruiter).
     """
-    # Check Username
-    result = await db.execute(
-        select(models.User).where(func.lower(models.User.username) == user.username.lower())
-    )
-    if result.scalars().first():
-        raise HTTPException(status_code=400, detail="Username already exists")
-
-    # Check Email
-    result = await db.execute(
-        select(models.User).where(func.lower(models.User.email) == user.email.lower())
-    )
-    if result.scalars().first():
-        raise HTTPException(status_code=400, detail="Email already registered")
+    # Check Username & Email (one query)
+    await check_user_conflicts(db, username=user.username, email=user.email)
 
     # Only recruiters (OWNER) should have a company name.
     user_company = None
@@ -63,14 +81,13 @@ async def create_user(
     new_user = models.User(
         username=user.username,
         email=user.email.lower(),
-        hashed_password=hash_password(user.password), # Hash the password
+        hashed_password=await ahash_password(user.password), # Hash the password (off the event loop)
         role=user.role,                
         company_name=user_company 
     )
     
     db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
+    await db.commit() # expire_on_commit=False: id comes back from the INSERT, defaults are client-side
 
     return APIResponse(
         success=True, 
@@ -110,12 +127,21 @@ async def update_user_me(
     **Features:**
     - Partial Updates: Only fields sent in the request are updated.
     - Supports updating: Username, Email, Company Name, Profile Image.
+    - Checks for username/email collisions (case-insensitive) before applying updates.
     """
-    # 1. Update fields if they are provided
+    # 1. Check Username & Email Duplication (one query, ignoring the user's own row)
+    await check_user_conflicts(
+        db,
+        username=user_update.username,
+        email=user_update.email,
+        exclude_user_id=current_user.id,
+    )
+
+    # 2. Update fields if they are provided
     if user_update.username:
         current_user.username = user_update.username
     if user_update.email:
-        current_user.email = user_update.email
+        current_user.email = user_update.email.lower()
     
     # This is the important one for you now! 
     if user_update.company_name:
@@ -124,9 +150,9 @@ async def update_user_me(
     if user_update.image_file:
         current_user.image_file = user_update.image_file
 
-    # 2. Save to DB
+    # 3. Save to DB (expire_on_commit=False: current_user keeps its values, no reload needed)
     await db.commit()
-    await db.refresh(current_user)
+    invalidate_user_cache(current_user.id)
 
     return APIResponse(
         success=True,
@@ -147,8 +173,7 @@ async def get_user(
     **Response:** `UserPublic` schema.
     - Unlike `UserPrivate`, this schema hides sensitive fields like email and phone number.
     """
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
-    user = result.scalars().first()
+    user = await db.get(models.User, user_id) # Primary-key lookup (identity map first)
     
     if not user:
          raise HTTPException(status_code=404, detail="User not found")
@@ -159,7 +184,11 @@ async def get_user(
         data=user
     )
 
-@router.get("/{user_id}/job_posts", response_model=APIResponse[list[JobResponse]])
+@router.get(
+    "/{user_id}/job_posts",
+    response_model=None, # Data is validated once by JobListAdapter, don't re-validate the response
+    responses={200: {"model": APIResponse[list[JobResponse]]}}, # Keeps the schema in the docs
+)
 async def get_user_job_posts(user_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
     """
     **Get Jobs Posted by User**
@@ -167,24 +196,25 @@ async def get_user_job_posts(user_id: int, db: Annotated[AsyncSession, Depends(g
     Fetches all active job listings created by a specific Recruiter (Owner).
     Useful for a "Company Page" or "Recruiter Profile" view.
     """
-    # Check if user exists first
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
-    if not result.scalars().first():
-        raise HTTPException(status_code=404, detail="User not found")
-
     # Fetch Jobs
     result = await db.execute(
         select(models.Job)
-        .options(selectinload(models.Job.owner))
+        .options(selectinload(models.Job.owner), raiseload("*"))
         .where(models.Job.owner_id == user_id)
         .order_by(models.Job.job_posted.desc()),
     )
     jobs = result.scalars().all()
+
+    # No jobs: only then check whether the user exists at all (EXISTS, no User row to load)
+    if not jobs:
+        user_exists = await db.scalar(select(exists().where(models.User.id == user_id)))
+        if not user_exists:
+            raise HTTPException(status_code=404, detail="User not found")
     
     return APIResponse(
         success=True, 
         message="User jobs retrieved successfully", 
-        data=jobs
+        data=JobListAdapter.validate_python(jobs, from_attributes=True)
     )
 
 @router.patch("/{user_id}", response_model=APIResponse[UserPrivate])
@@ -210,38 +240,35 @@ async def update_user(
     if current_user.id != user_id and current_user.role != models.Role.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to update this profile")
 
-    # Fetch User
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
-    user = result.scalars().first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Check Username & Email Duplication (one query, ignoring this user's own row)
+    await check_user_conflicts(
+        db,
+        username=user_update.username,
+        email=user_update.email,
+        exclude_user_id=user_id,
+    )
 
-    # Check Username Duplication
-    if user_update.username and user_update.username.lower() != user.username.lower():
-        result = await db.execute(
-            select(models.User).where(func.lower(models.User.username) == user_update.username.lower())
-        )
-        if result.scalars().first():
-            raise HTTPException(status_code=400, detail="Username already exists")
+    # Apply Updates: a single UPDATE ... RETURNING (no SELECT before, no refresh after)
+    update_data = user_update.model_dump(exclude_unset=True, exclude={'password'})
+    if 'email' in update_data:
+        update_data['email'] = update_data['email'].lower()
 
-    # Check Email Duplication
-    if user_update.email and user_update.email.lower() != user.email.lower():
+    if update_data:
         result = await db.execute(
-            select(models.User).where(func.lower(models.User.email) == user_update.email.lower())
+            update(models.User)
+            .where(models.User.id == user_id)
+            .values(**update_data)
+            .returning(models.User)
         )
-        if result.scalars().first():
-            raise HTTPException(status_code=400, detail="Email already registered")
+        user = result.scalar_one_or_none()
+    else:
+        user = await db.get(models.User, user_id)
 
-    # Apply Updates
-    update_data = user_update.model_dump(exclude_unset=True, exclude={'password'})
-    for key, value in update_data.items():
-        if key == 'email':
-            setattr(user, key, value.lower())
-        else:
-            setattr(user, key, value)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
     await db.commit()
-    await db.refresh(user)
+    invalidate_user_cache(user.id)
     
     return APIResponse(
         success=True, 
@@ -268,11 +295,11 @@ async def delete_user(
     if current_user.id != user_id and current_user.role != models.Role.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to delete this account")
 
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
-    user = result.scalars().first()
+    user = await db.get(models.User, user_id) # Primary-key lookup (identity map first)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     await db.delete(user)
-    await db.commit()
\ No newline at end of file
+    await db.commit()
+    invalidate_user_cache(user_id)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, TypeAdapter
 from typing import Optional, Generic, TypeVar, List
 from datetime import datetime
 from models import Role, ApplicationStatus, JobType
@@ -69,6 +69,7 @@ class UserProfileResponse(UserProfileBase):
     id: int
     user_id: int
     resume_url: Optional[str] = None
+    embedding_status: str # "pending" until the CV embedding is computed, then "ready" ("failed": upload again)
 
 # --- JOB SCHEMAS ---
 class JobBase(BaseModel):
@@ -116,6 +117,9 @@ class JobResponse(JobBase):
     job_posted: datetime
     owner: UserPublic
 
+# Validates a whole list of Job ORM objects in one call (built once, reused per request)
+JobListAdapter = TypeAdapter(list[JobResponse])
+
 # --- AI MATCHING SCHEMAS ---
 
 class MatchRequest(BaseModel):
@@ -1,28 +1,208 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+from functools import lru_cache
+from hashlib import blake2b
+from threading import Lock
+from cachetools import LRUCache
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from config import get_settings
 
-# Load the model globally so it only loads once when the server starts.
-print("Loading the model ....")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-print("Model Loaded!")
+# Embedding Cache: blake2b(text) -> int8-quantized vector. Popular searches and re-saves skip the model.
+# Keyed on a 16-byte digest so the cache doesn't hold on to the (possibly long) texts,
+# and stored as int8 + scale (see `quantize`): ~2.5-3x less memory per entry than float32
+# (the vector data shrinks 4x, the ndarray header, tuple and scale float don't).
+_embedding_cache: LRUCache = LRUCache(maxsize=4096)
+# get_embedding runs in worker threads; LRUCache reorders on every read, so guard it
+_embedding_cache_lock = Lock()
+# Hit/miss counters for `cache_stats()` (updated under the lock)
+_embedding_cache_counts = {"hits": 0, "misses": 0}
 
-def get_embedding(text: str) -> list[float]:
+# "Blank" vector of the correct size (384 for MiniLM), returned for empty text
+BLANK_EMBEDDING = np.zeros(384, dtype=np.float32)
+BLANK_EMBEDDING.flags.writeable = False
+
+def quantize(vector: np.ndarray) -> tuple[np.ndarray, float]:
+    """
+    Compresses a float vector to int8 with one scale factor (`vector ≈ q * scale`).
+    Near-lossless for cosine similarity on normalized sentence embeddings.
+    """
+    scale = float(np.max(np.abs(vector))) / 127.0 or 1.0 # All-zero vector: any scale works
+    return np.round(vector / scale).astype(np.int8), scale
+
+def dequantize(q: np.ndarray, scale: float) -> np.ndarray:
+    """ Reverses `quantize`: returns a read-only float32 vector. """
+    vector = q.astype(np.float32) * np.float32(scale)
+    vector.flags.writeable = False
+    return vector
+
+# Caps concurrent CPU-heavy jobs (inference, PDF parsing). More threads than cores
+# only makes them fight over the same BLAS threads.
+_inference_slots = asyncio.Semaphore(get_settings().inference_concurrency)
+
+
+@lru_cache(maxsize=1)
+def get_model():
+    """
+    **Lazy Model Loader**
+
+    Imports `sentence_transformers` (and PyTorch underneath) and loads the model
+    on first use instead of at import time, so the server starts without paying
+    the multi-second import/load cost. The instance is cached for the process.
+    The app lifespan calls `warm_up_model()` so this normally happens at startup.
+
+    **Device:** `EMBEDDING_DEVICE` (default: CUDA when available). On CUDA the
+    weights are cast to fp16 (half the memory traffic, tensor cores).
+
+    **Backend:** `EMBEDDING_BACKEND=onnx` runs the model's exported ONNX graph
+    (`EMBEDDING_ONNX_FILE`, int8-quantized variants included) on ONNX Runtime,
+    typically several times faster than PyTorch on CPU. Same vectors, same API.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    settings = get_settings()
+    device = settings.embedding_device
+    if device == "auto":
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    print("Loading the model ....")
+    if settings.embedding_backend == "onnx":
+        model = SentenceTransformer(
+            'all-MiniLM-L6-v2',
+            device=device,
+            backend="onnx",
+            model_kwargs={"file_name": settings.embedding_onnx_file},
+        )
+    else:
+        model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+        if device.startswith("cuda"):
+            model = model.half()
+    model.eval()
+    print("Model Loaded!")
+    return model
+
+def warm_up_model() -> None:
+    """
+    Loads the model and runs one encode, so the first real request doesn't pay
+    the load time or the first-call kernel setup. Blocking: call it from a thread.
+    """
+    get_model().encode(["warm up"], convert_to_numpy=True)
+
+def get_embedding(text: str) -> np.ndarray:
     """
     **Generate Vector Embedding**
     
     Converts a string of text (e.g., "Python Developer with AWS experience") 
-    into a mathematical vector (a list of 384 floating-point numbers).
+    into a mathematical vector (an array of 384 float32 numbers).
     
     **Reason**
     The database (pgvector) needs these numbers to perform "Semantic Search" 
     (finding related concepts, not just matching keywords).
     
     **Returns:**
-    - List[float]: A 384-dimensional vector.
+    - np.ndarray (float32): A 384-dimensional vector. Treat it as read-only.
+      pgvector accepts it as-is, no conversion to a Python list needed.
     - If text is empty, returns a zero-vector.
     """
+    return get_embeddings([text])[0]
+
+def peek_embedding(text: str) -> np.ndarray | None:
+    """ Returns the cached embedding of `text` (or the zero-vector if empty), None on a cache miss. """
     if not text:
-        # Return a "blank" vector of the correct size (384 for MiniLM)
-        return [0.0] * 384
+        return BLANK_EMBEDDING
+    with _embedding_cache_lock:
+        entry = _embedding_cache.get(blake2b(text.encode(), digest_size=16).digest())
+        if entry is None:
+            return None
+        # Misses are counted by get_embeddings, which always follows a miss
+        _embedding_cache_counts["hits"] += 1
+    return dequantize(*entry)
+
+def cache_stats() -> dict:
+    """ Embedding cache size and hit/miss counters since startup (for monitoring). """
+    with _embedding_cache_lock:
+        hits, misses = _embedding_cache_counts["hits"], _embedding_cache_counts["misses"]
+        return {
+            "size": len(_embedding_cache),
+            "maxsize": _embedding_cache.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+
+def get_embeddings(texts: list[str]) -> list[np.ndarray]:
+    """
+    **Batch Vector Embeddings**
+
+    Same as `get_embedding`, for many texts at once. Cache misses are encoded in a
+    single `model.encode` call (batches of 32), which is much cheaper than one call
+    per text. Duplicate texts in the batch are encoded once.
+    Output order matches `texts`; empty texts get a zero-vector.
+    """
+    keys = [blake2b(text.encode(), digest_size=16).digest() if text else None for text in texts]
+
+    # 1. Cache lookups
+    with _embedding_cache_lock:
+        entries = [_embedding_cache.get(key) if key else None for key in keys]
+    vectors = [
+        dequantize(*entry) if entry is not None else (None if key else BLANK_EMBEDDING)
+        for key, entry in zip(keys, entries)
+    ]
+
+    # 2. Encode every miss in one pass
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    # Distinct texts only; every position of a duplicate gets the same vector
+    positions: dict[bytes, list[int]] = {}
+    for i in missing:
+        positions.setdefault(keys[i], []).append(i)
+
+    # A miss is a text that gets encoded: in-batch duplicates of it count as hits
+    with _embedding_cache_lock:
+        _embedding_cache_counts["misses"] += len(positions)
+        _embedding_cache_counts["hits"] += sum(1 for key in keys if key) - len(positions)
+    if missing:
+        from torch import inference_mode
+
+        # inference_mode: no autograd bookkeeping during the forward pass
+        with inference_mode():
+            encoded = get_model().encode(
+                [texts[indexes[0]] for indexes in positions.values()],
+                batch_size=32,
+                convert_to_numpy=True,
+                normalize_embeddings=True, # Unit length: cosine distance == 1 - inner product
+            )
+        quantized = [quantize(row) for row in encoded.astype(np.float32, copy=False)]
+        with _embedding_cache_lock:
+            for key, entry in zip(positions, quantized):
+                _embedding_cache[key] = entry
+        # Misses return the same int8 round-trip as later cache hits, so a text always
+        # gets the same vector whatever the cache state. Duplicates share one (read-only) array.
+        for indexes, entry in zip(positions.values(), quantized):
+            row = dequantize(*entry)
+            for i in indexes:
+                vectors[i] = row
+
+    return vectors
+
+async def run_inference(func, *args):
+    """
+    **Run CPU-heavy Work off the Event Loop**
+
+    Runs `func(*args)` in the threadpool, at most `INFERENCE_CONCURRENCY` at a time.
+    Use it for anything that calls the model (or parses PDFs) from an async handler.
+    """
+    async with _inference_slots:
+        return await run_in_threadpool(func, *args)
+
+async def get_embedding_async(text: str) -> np.ndarray:
+    """
+    **Non-blocking Embedding**
+
+    Goes through the micro-batcher (`services.embedding_batcher`): concurrent calls
+    share one model call, which runs via `run_inference`. Model inference is CPU-bound
+    (tens of ms) and would otherwise freeze the event loop for every other request.
+    """
+    # Imported here: the batcher itself builds on this module
+    from services.embedding_batcher import embedder
 
-    # .tolist() converts the numpy array to a standard Python list
-    return model.encode(text).tolist()
\ No newline at end of file
+    return await embedder.embed(text)
@@ -0,0 +1,89 @@
+import asyncio
+
+import numpy as np
+
+from config import get_settings
+from services.ai import get_embeddings, peek_embedding, run_inference
+
+
+class BatchingEmbedder:
+    """
+    **Embedding Micro-Batcher**
+
+    Coalesces concurrent embedding requests (job posts, searches, CV uploads)
+    into a single `get_embeddings` call: the first request opens a batch, which is
+    flushed after `max_wait` seconds or as soon as it holds `max_batch_size` texts.
+    One forward pass over N texts costs far less than N separate passes.
+
+    Each caller still gets only its own vector back. Cached texts skip the queue.
+    """
+
+    def __init__(self, max_batch_size: int = 32, max_wait: float = 0.01):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # Created lazily: both must belong to the running event loop
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        """ Returns the embedding of `text`, computed together with other pending requests. """
+        cached = peek_embedding(text)
+        if cached is not None:
+            return cached
+
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def close(self) -> None:
+        """ Stops the background worker (app shutdown). """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # 1. Wait for the first request, then collect more until the batch is full or the time is up
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except TimeoutError:
+                    break
+
+            # 2. One model call for the whole batch
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            vectors = await run_inference(get_embeddings, [text for text, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        # 3. Hand every caller its own vector (skip callers that gave up)
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+_settings = get_settings()
+embedder = BatchingEmbedder(
+    max_batch_size=_settings.embedding_batch_size,
+    max_wait=_settings.embedding_batch_wait_ms / 1000,
+)
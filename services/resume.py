@@ -1,40 +1,135 @@
+import logging
 import re
+from hashlib import blake2b
+from threading import Lock
+from cachetools import TTLCache
+import pypdfium2 as pdfium
 from pypdf import PdfReader
 from io import BytesIO
-from services.ai import get_embedding
+from services.ai import run_inference
 
-KNOWN_SKILLS = {
+logger = logging.getLogger(__name__)
+
+# Analysis Cache: blake2b(file bytes) -> analyze_resume() result.
+# Re-uploading the same PDF (e.g. with force_refresh) skips parsing.
+_analysis_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+# analyze_resume reads/writes the cache on the event loop (never across an await);
+# the lock keeps it safe should it ever be used from a worker thread too
+_analysis_cache_lock = Lock()
+# PDFium is not thread-safe: one document at a time per process
+_pdfium_lock = Lock()
+
+# Read-only vocabulary: frozenset, so nothing can add to it after the pattern is built
+KNOWN_SKILLS = frozenset({
     "Python", "FastAPI", "Django", "Flask", "Docker", "Kubernetes", 
     "AWS", "GCP", "Azure", "SQL", "PostgreSQL", "MySQL", "MongoDB",
     "React", "Vue", "Angular", "Node.js", "Java", "Go", "C++",
     "Machine Learning", "Deep Learning", "PyTorch", "TensorFlow",
     "LightGBM", "YOLO", "Computer Vision", "NLP", "Git", "Linux",
     "Scikit-learn", "Pandas", "NumPy"
-}
+})
+
+
+def _trie_pattern(words) -> str:
+    """
+    **Trie-factored Regex**
+
+    Builds an alternation where words share their common prefixes
+    (`py(?:thon|torch)` instead of `python|pytorch`), like an Aho-Corasick automaton.
+    At each position the engine follows a single branch per character instead of
+    trying every word in turn, so the cost no longer grows with the vocabulary size.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {} # End-of-word marker
+
+    def build(node: dict) -> str:
+        ends_here = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        # Greedy, longest first: the end-of-word option is tried last
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends_here:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
 
+# Section headers that start the work history, in order of preference
+EXPERIENCE_HEADERS = ("experience", "work history", "employment")
+
+# Compiled once at import, not per CV:
+# lowercase -> canonical spelling, and ONE pattern that finds years, experience headers
+# and skills, so the resume text is scanned a single time (no lowercased copies).
+# Skills are trie-factored; (?<!\w)/(?!\w) instead of \b so "C++" still matches.
+_SKILL_BY_LOWER = {skill.lower(): skill for skill in KNOWN_SKILLS}
+ANALYSIS_RE = re.compile(
+    r"(?P<year>\b20\d{2}\b)"
+    r"|(?P<header>" + "|".join(re.escape(header) for header in EXPERIENCE_HEADERS) + r")"
+    r"|(?P<skill>(?<!\w)(?:" + _trie_pattern(_SKILL_BY_LOWER) + r")(?!\w))",
+    re.IGNORECASE,
+)
+# Only the first 16K characters are analyzed: name, work history and skills are near the top,
+# and this bounds the scan for novel-length CVs. The full text is still stored.
+MAX_SCAN_CHARS = 16384
+# Only the first 2000 characters are embedded, to keep the vector focused on the summary/recent work
+EMBEDDING_CHARS = 2000
+FIRST_LINE_RE = re.compile(r"\S[^\n]*")
+KERNING_RE = re.compile(r"([A-Z])\s+(?=[a-z])")
+
+
+def _extract_with_pdfium(file_content: bytes) -> str:
+    """ Text of every page via PDFium (C++), several times faster than pypdf. """
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_content)
+        try:
+            pages = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+    # PDFium ends lines with \r\n
+    return "\n".join(pages).replace("\r\n", "\n").strip()
 
 def extract_text_from_pdf(file_content: bytes) -> str:
     """
     **PDF Text Extractor**
     
     Reads the raw bytes of a PDF file and converts it into a plain string.
+    Uses PDFium (`pypdfium2`); falls back to pypdf for the rare PDFs PDFium can't open
+    or gets no text out of (so a PDFium text-extraction regression can't silently blank CVs).
     
     **Parameters:**
     - `file_content`: The binary content of the uploaded file.
     """
+    try:
+        text = _extract_with_pdfium(file_content)
+        if text:
+            return text
+        logger.info("PDFium found no text in PDF, falling back to pypdf")
+    except Exception as e:
+        logger.warning("PDFium could not read PDF, falling back to pypdf: %s", e)
+
     try:
         # Open PDF from memory (no need to save to disk first)
-        pdf_reader = PdfReader(BytesIO(file_content))
+        # strict=False: tolerate slightly malformed PDFs instead of failing on them
+        pdf_reader = PdfReader(BytesIO(file_content), strict=False)
 
-        # Extract text page by page
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        # Extract text page by page, joined once at the end (no quadratic `+=`)
+        # `or ""`: image-only pages have no text
+        pages = [page.extract_text() or "" for page in pdf_reader.pages]
         
-        return text.strip()
+        return "\n".join(pages).strip()
     
     except Exception as e:
-        print(f"Error reading PDF: {e}")
+        logger.warning("Error reading PDF: %s", e)
         return ""
 
 def clean_name(name: str) -> str:
@@ -51,79 +146,65 @@ def clean_name(name: str) -> str:
     if not name:
         return ""
 
-    return re.sub(r"([A-Z])\s+(?=[a-z])", r"\1", name).strip()
+    return KERNING_RE.sub(r"\1", name).strip()
 
 
-def extract_details(text: str):
+def analyze_text(text: str) -> tuple[str, int, list[str]]:
     """
-    **Smart Detail Extractor**
+    **Single-pass Text Analyzer**
     
-    Attempts to parse specific metadata from the raw resume text.
+    Parses name, experience and skills from the raw resume text.
+    Years, section headers and skills are all found by one `ANALYSIS_RE.finditer` pass,
+    and the year range is folded as it goes (no list of years is built).
     
     **Extraction Logic:**
     1. **Name:** Assumes the first non-empty line is the candidate's name. Applies cleaning.
     2. **Experience:** - Searches for sections like "Experience" or "Work History".
        - Only counts years found *after* that header to avoid counting graduation dates.
        - Calculates `Max Year - Min Year` to estimate total experience.
+    3. **Skills:** Keywords from `KNOWN_SKILLS`, whole words only, case-insensitive
+       ('Go' matches "I know Go", but not "Google").
     
     **Returns:**
     - `full_name` (str)
     - `experience_years` (int)
+    - `skills` (list[str])
     """
     # 1. Name Extraction (Heuristic: First line)
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-    raw_name = lines[0] if lines else None
-    full_name = clean_name(raw_name) 
-    
-    # 2. Experience Calculation
-    lower_text = text.lower()
-    
-    # Find where the "Experience" section starts
-    experience_start_index = -1
-    for keyword in ["experience", "work history", "employment"]:
-        idx = lower_text.find(keyword)
-        if idx != -1:
-            experience_start_index = idx
-            break
-
-    # Crop text to start from "Experience" (or use full text if not found)
-    target_text = text if experience_start_index == -1 else text[experience_start_index:]
-    
-    # Find all years (e.g., 2020, 2024) in the target text
-    years = re.findall(r"\b(20\d{2})\b", target_text)
-    
-    experience_years = 0
-    if years:
-        # Convert strings to integers
-        years_int = [int(y) for y in years]
+    first_line = FIRST_LINE_RE.search(text)
+    full_name = clean_name(first_line.group().strip() if first_line else None)
 
-        if years_int:
-            # Simple math: End Year - Start Year
-            experience_years = max(years_int) - min(years_int)
-    
-    return full_name, experience_years
+    # 2. One scan: skills, plus a running (min, max) year range for every possible
+    # start of the experience section: the whole text (None) and after each header's
+    # first occurrence. The preferred header is only known at the end, so track them all.
+    year_ranges: dict[str | None, list[int]] = {None: [9999, 0]}
+    found_skills = set()
 
+    for match in ANALYSIS_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == "year":
+            year = int(match.group())
+            for year_range in year_ranges.values():
+                if year < year_range[0]:
+                    year_range[0] = year
+                if year > year_range[1]:
+                    year_range[1] = year
+        elif kind == "header":
+            year_ranges.setdefault(match.group().lower(), [9999, 0])
+        else:
+            found_skills.add(_SKILL_BY_LOWER[match.group().lower()])
 
-def extract_skills(text: str) -> list[str]:
-    """
-    **Skill Matcher**
-    
-    Scans the resume for keywords defined in `KNOWN_SKILLS`.
-    
-    **Logic:**
-    - Uses regex `\bword\b` (word boundaries) to ensure exact matches.
-    - Example: 'Go' matches "I know Go", but not "Google".
-    - Case-insensitive matching.
-    """
-    found_skills = set()
-    text_lower = text.lower()
+    # 3. Experience Calculation
+    # Years counted from where the "Experience" section starts (or the full text if not found)
+    section = next((header for header in EXPERIENCE_HEADERS if header in year_ranges), None)
+    low, high = year_ranges[section]
 
-    for skill in KNOWN_SKILLS:
-        pattern = r"\b" + re.escape(skill.lower()) + r"\b"
-        if re.search(pattern, text_lower):
-            found_skills.add(skill)
-    
-    return list(found_skills)
+    experience_years = 0
+    if high:
+        # Simple math: End Year - Start Year
+        experience_years = high - low
+
+    return full_name, experience_years, list(found_skills)
 
 # def estimate_experience(text: str) -> int:
 #     years = re.findall(r"\b(20\d{2})\b", text)
@@ -137,36 +218,49 @@ def extract_skills(text: str) -> list[str]:
 #     diff = max_years - min_years
 #     return max(0, diff)
 
-def analyze_resume(file_content: bytes):
+async def analyze_resume(file_content: bytes):
     """
     **Main Analysis Pipeline**
     
-    Orchestrates the entire CV analysis process.
+    Orchestrates the CV parsing. Runs on the event loop; the CPU-heavy steps (1 and 2-3)
+    are handed to the threadpool through `run_inference`.
     
     **Steps:**
     1. **Extract Text:** Converts PDF binary to string.
-    2. **Extract Metadata:** Gets Name, Experience Years.
-    3. **Extract Skills:** Finds keywords.
-    4. **Generate AI Brain:** Creates a vector embedding of the first 2000 chars.
+    2-3. **Extract Metadata & Skills:** Gets Name, Experience Years and keywords
+       in a single pass over the first `MAX_SCAN_CHARS` characters (`analyze_text`).
+    
+    The embedding is NOT computed here: it is the slow part, so the caller schedules it
+    in the background (see `routers/profiles.py`) and responds right away.
+    `embedding_text` is the text to embed.
     
+    Results are cached for an hour by a hash of the file content.
+
     **Returns:**
     - A dictionary containing all extracted data, ready for the database.
     """
-    raw_text = extract_text_from_pdf(file_content)
+    key = blake2b(file_content, digest_size=16).digest()
+    with _analysis_cache_lock:
+        cached = _analysis_cache.get(key)
+    if cached is not None:
+        # Copy so the caller can't change the cached result
+        return {**cached, "skills": list(cached["skills"])}
+
+    raw_text = await run_inference(extract_text_from_pdf, file_content)
     
     if not raw_text:
         return None
-    
-    extracted_name, years = extract_details(raw_text)
-    skills = extract_skills(raw_text)
 
-    # Only embed the first 2000 characters to keep it focused on the summary/recent work
-    embedding = get_embedding(raw_text[:2000])
+    extracted_name, years, skills = await run_inference(analyze_text, raw_text[:MAX_SCAN_CHARS])
     
-    return {
+    analysis = {
         "text": raw_text,
-        "embedding": embedding,
+        "embedding_text": raw_text[:EMBEDDING_CHARS],
         "skills": skills,
         "experience_years": years,
         "extracted_name": extracted_name
-    }
\ No newline at end of file
+    }
+    with _analysis_cache_lock:
+        _analysis_cache[key] = {**analysis, "skills": list(skills)}
+
+    return analysis
\ No newline at end of file
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("asyncpg")
+pytest.importorskip("sqlalchemy")
+
+from asyncpg.exceptions import InvalidAuthorizationSpecificationError, InvalidCatalogNameError
+from pydantic import ValidationError
+from sqlalchemy import Column, Integer, String, func, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
+
+from config import get_settings
+
+try:
+    settings = get_settings()
+except ValidationError:
+    pytest.skip("Database settings (POSTGRES_*, SECRET_KEY) are not configured", allow_module_level=True)
+
+from services.db import COPY_THRESHOLD, bulk_insert
+
+
+class ScratchBase(DeclarativeBase):
+    pass
+
+class BulkInsertRow(ScratchBase):
+    """ Throwaway table, created and dropped by the test. """
+    __tablename__ = "bulk_insert_test_rows"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+
+
+def _cannot_connect(exc: BaseException) -> bool:
+    """ Unreachable server, wrong credentials or missing database (SQLAlchemy wraps asyncpg errors). """
+    while exc is not None:
+        if isinstance(exc, (OSError, InvalidAuthorizationSpecificationError, InvalidCatalogNameError)):
+            return True
+        exc = exc.__cause__ or getattr(exc, "orig", None)
+    return False
+
+async def _copy_then_rollback() -> int:
+    # NullPool: connections belong to this test's event loop only
+    engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(ScratchBase.metadata.create_all)
+    except (OSError, DBAPIError) as exc:
+        await engine.dispose()
+        if not _cannot_connect(exc):
+            raise
+        pytest.skip(f"Database not reachable: {exc}")
+
+    try:
+        # COPY path as the session's very first statement, then roll back
+        async with AsyncSession(engine) as session:
+            rows = [{"id": i, "name": f"row {i}"} for i in range(COPY_THRESHOLD)]
+            await bulk_insert(session, BulkInsertRow, rows)
+            await session.rollback()
+
+        async with AsyncSession(engine) as session:
+            return await session.scalar(select(func.count()).select_from(BulkInsertRow))
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(ScratchBase.metadata.drop_all)
+        await engine.dispose()
+
+def test_bulk_insert_copy_is_rolled_back():
+    assert asyncio.run(_copy_then_rollback()) == 0
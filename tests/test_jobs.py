@@ -0,0 +1,69 @@
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pgvector")
+np = pytest.importorskip("numpy")
+
+import models
+from routers.jobs import match_jobs_profile
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    """ Answers the queries of `match_jobs_profile` in order: profile, SET LOCAL, matches. """
+
+    def __init__(self, profile, matches, limit):
+        # The database applies the LIMIT
+        self.results = [FakeResult([profile]), FakeResult([]), FakeResult(matches[:limit])]
+
+    async def execute(self, query):
+        return self.results.pop(0)
+
+
+def make_matches(total: int) -> list[tuple[models.Job, float]]:
+    owner = models.User(id=1, username="recruiter", email="r@example.com", role=models.Role.OWNER)
+    return [
+        (
+            models.Job(
+                id=i,
+                title=f"Backend Engineer {i}",
+                company="Acme",
+                location="Jakarta",
+                salary=10_000_000,
+                description="Build and run the APIs behind our job portal.",
+                job_type=models.JobType.FULL_TIME,
+                is_remote=False,
+                skills=["Python"],
+                owner_id=owner.id,
+                job_posted=datetime.now(UTC),
+                owner=owner,
+            ),
+            0.1 * i,
+        )
+        for i in range(1, total + 1)
+    ]
+
+@pytest.mark.parametrize("limit, total", [(5, 3), (5, 5), (5, 10), (1, 4), (5, 0)])
+def test_match_returns_every_match_up_to_limit(limit, total):
+    profile = models.UserProfile(id=1, user_id=2, profile_embedding=np.ones(384, dtype=np.float32))
+    seeker = models.User(id=2, username="seeker", email="s@example.com", role=models.Role.SEEKER)
+    db = FakeSession(profile, make_matches(total), limit)
+
+    response = asyncio.run(match_jobs_profile(db=db, current_user=seeker, limit=limit))
+
+    assert len(response.data) == min(limit, total)
+    assert [job.id for job in response.data] == list(range(1, min(limit, total) + 1))
+    if total == 0:
+        assert response.data == []